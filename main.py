@@ -1,186 +1,616 @@
 import os
+import sys
 import json
 import threading
-import bisect
+import weakref
 import re
+from bisect import bisect_left, bisect_right
 from datetime import datetime
+from operator import itemgetter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 CONFIG = {
     "data_dir": "./data",
-    "btree_degree": 2
+    "btree_degree": 32,
+    "log_compact_threshold": 1000,
+    "log_flush_every": 32,
+    "log_flush_interval_ms": 200
 }
 
+LOG_FILE = "data.jsonl"
+
 # B-Tree implementation
+# Leaves hold keys with parallel payloads (lists of doc ids); internal nodes
+# hold separator keys with parallel children, children[i + 1] starting at keys[i].
+# Published nodes are never modified: writers copy the root-to-leaf path they
+# change and swap in the new root, so readers need no lock.
 class BTreeNode:
+    __slots__ = ('t', 'leaf', 'keys', 'children', 'payloads')
+
     def __init__(self, t, leaf=False):
         self.t = t
         self.leaf = leaf
         self.keys = []
-        self.values = []
+        self.children = None if leaf else []
+        self.payloads = [] if leaf else None
+
+    def copy(self):
+        node = BTreeNode(self.t, self.leaf)
+        node.keys = self.keys[:]
+        if self.leaf:
+            node.payloads = self.payloads[:]
+        else:
+            node.children = self.children[:]
+        return node
 
     def split_child(self, i, y):
         z = BTreeNode(y.t, y.leaf)
         t = y.t
-        z.keys = y.keys[t:]
-        z.values = y.values[t:]
-        y.keys = y.keys[:t-1]
-        y.values = y.values[:t-1] if y.leaf else y.values[:t]
-        self.keys.insert(i, y.keys.pop())
-        self.values.insert(i+1, z)
-
-    def insert_non_full(self, key, value):
-        if self.leaf:
-            pos = bisect.bisect_left(self.keys, key)
-            if pos < len(self.keys) and self.keys[pos] == key:
-                self.values[pos].append(value)
-            else:
-                self.keys.insert(pos, key)
-                self.values.insert(pos, [value])
+        # y is a private copy, so its lists can be truncated in place
+        if y.leaf:
+            z.keys = y.keys[t-1:]
+            z.payloads = y.payloads[t-1:]
+            del y.keys[t-1:]
+            del y.payloads[t-1:]
+            pivot = z.keys[0]
         else:
-            i = bisect.bisect_right(self.keys, key)
-            child = self.values[i]
-            if len(child.keys) == 2*self.t - 1:
-                self.split_child(i, child)
-                if key > self.keys[i]:
+            pivot = y.keys[t-1]
+            z.keys = y.keys[t:]
+            z.children = y.children[t:]
+            del y.keys[t-1:]
+            del y.children[t:]
+        self.keys.insert(i, pivot)
+        self.children.insert(i+1, z)
+
+    # bisect_left/bisect_right/len are bound as defaults so the loops use fast locals
+    def insert_non_full(self, key, value, _bl=bisect_left, _br=bisect_right, _len=len):
+        full = 2*self.t - 1
+        node = self
+        while not node.leaf:
+            keys = node.keys
+            children = node.children
+            i = _br(keys, key)
+            child = children[i] = children[i].copy()
+            if _len(child.keys) == full:
+                node.split_child(i, child)
+                if key >= keys[i]:
                     i += 1
-            self.values[i].insert_non_full(key, value)
+            node = children[i]
+        keys = node.keys
+        payloads = node.payloads
+        pos = _bl(keys, key)
+        if pos < _len(keys) and keys[pos] == key:
+            payloads[pos] = payloads[pos] + [value]
+        else:
+            keys.insert(pos, key)
+            payloads.insert(pos, [value])
 
-    def search(self, key):
-        i = bisect.bisect_left(self.keys, key)
-        if i < len(self.keys) and self.keys[i] == key:
-            return self.values[i]
-        if self.leaf:
-            return []
-        return self.values[i].search(key)
+    def remove(self, key, value):
+        # like insert_non_full, self is a private copy and the path is copied down
+        node = self
+        while not node.leaf:
+            children = node.children
+            i = bisect_right(node.keys, key)
+            node = children[i] = children[i].copy()
+        keys = node.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            rest = [v for v in node.payloads[i] if v != value]
+            if rest:
+                node.payloads[i] = rest
+            else:
+                del keys[i]
+                del node.payloads[i]
+
+    def search(self, key, _bl=bisect_left, _br=bisect_right, _len=len):
+        node = self
+        while not node.leaf:
+            node = node.children[_br(node.keys, key)]
+        keys = node.keys
+        i = _bl(keys, key)
+        if i < _len(keys) and keys[i] == key:
+            return node.payloads[i]
+        return []
+
+def _hashable(key):
+    try:
+        hash(key)
+    except TypeError:
+        return False
+    return True
+
+def _even_spans(n, size):
+    k = -(-n // size)
+    return [(n*j//k, n*(j+1)//k) for j in range(k)]
 
 class BTreeIndex:
     def __init__(self, fields, t=2):
         self.fields = fields if isinstance(fields, tuple) else (fields,)
         self.t = t
+        if len(self.fields) == 1:
+            get = itemgetter(self.fields[0])
+            self._getter = lambda doc: (get(doc),)
+        else:
+            self._getter = itemgetter(*self.fields)
         self.root = BTreeNode(t, leaf=True)
         self.lock = threading.Lock()
+        # exact-key map answering equality lookups without a tree descent;
+        # like leaf payloads, its lists are replaced rather than mutated.
+        # Unhashable keys (e.g. list fields) are only kept in the tree.
+        self._hash = {}
+        # types of the indexed values at each key position, None excluded
+        self._types = [set() for _ in self.fields]
+
+    def _note_types(self, key):
+        for types, value in zip(self._types, key):
+            if value is not None:
+                types.add(type(value))
+
+    def matches_exactly(self, values):
+        # The WHERE predicate also matches across types (30 against "30"), so a
+        # lookup is only complete if every indexed value has the literal's type
+        return all(types <= {type(v)} for types, v in zip(self._types, values))
 
     def _extract_key(self, doc):
-        return tuple(doc.get(f) for f in self.fields)
+        try:
+            return self._getter(doc)
+        except KeyError:
+            return tuple(doc.get(f) for f in self.fields)
 
     def insert(self, doc, doc_id):
         key = self._extract_key(doc)
         with self.lock:
-            r = self.root
+            r = self.root.copy()
             if len(r.keys) == 2*self.t - 1:
                 s = BTreeNode(self.t, leaf=False)
-                s.values.append(r)
+                s.children.append(r)
                 s.split_child(0, r)
-                self.root = s
-            self.root.insert_non_full(key, doc_id)
+                r = s
+            r.insert_non_full(key, doc_id)
+            self.root = r
+            self._note_types(key)
+            if _hashable(key):
+                self._hash[key] = self._hash.get(key, []) + [doc_id]
+
+    def remove(self, doc, doc_id):
+        key = self._extract_key(doc)
+        hashable = _hashable(key)
+        with self.lock:
+            ids = self._hash.get(key) if hashable else self.root.search(key)
+            if not ids or doc_id not in ids:
+                return
+            r = self.root.copy()
+            r.remove(key, doc_id)
+            self.root = r
+            if not hashable:
+                return
+            rest = [i for i in ids if i != doc_id]
+            if rest:
+                self._hash[key] = rest
+            else:
+                del self._hash[key]
+
+    def bulk_load(self, pairs):
+        # Replaces the tree with one built bottom-up from (key, doc_id) pairs
+        t = self.t
+        keys, payloads = [], []
+        for key, doc_id in sorted(pairs, key=lambda p: p[0]):
+            if keys and keys[-1] == key:
+                payloads[-1].append(doc_id)
+            else:
+                keys.append(key)
+                payloads.append([doc_id])
+        for key in keys:
+            self._note_types(key)
+        level = []
+        for lo, hi in _even_spans(len(keys), 2*t - 1):
+            node = BTreeNode(t, leaf=True)
+            node.keys = keys[lo:hi]
+            node.payloads = payloads[lo:hi]
+            level.append(node)
+        firsts = [node.keys[0] for node in level]
+        while len(level) > 1:
+            parents, parent_firsts = [], []
+            for lo, hi in _even_spans(len(level), 2*t):
+                node = BTreeNode(t, leaf=False)
+                node.keys = firsts[lo+1:hi]
+                node.children = level[lo:hi]
+                parents.append(node)
+                parent_firsts.append(firsts[lo])
+            level, firsts = parents, parent_firsts
+        with self.lock:
+            self.root = level[0] if level else BTreeNode(t, leaf=True)
+            self._hash = {key: ids[:] for key, ids in zip(keys, payloads) if _hashable(key)}
 
     def find(self, key_tuple):
-        return self.root.search(key_tuple)
+        try:
+            return self._hash.get(key_tuple, [])
+        except TypeError:
+            return self.root.search(key_tuple)
 
 # JSON IO
+# orjson is used when installed, the stdlib json module otherwise.
+# Log lines are handled as bytes either way. Both backends must be able to
+# read every log, so NaN/Infinity and integers outside orjson's 64-bit range
+# are rejected instead of written.
+_RE_LONG_DIGITS = re.compile(rb"\d{19}")
+
+def _parse_int64(s):
+    n = int(s)
+    if not -2**63 <= n < 2**64:
+        raise ValueError(f"Integer exceeds 64-bit range: {s}")
+    return n
+
+def _reject_constant(s):
+    raise ValueError(f"{s} is not valid JSON")
+
+def _loads_checked(s):
+    return json.loads(s, parse_int=_parse_int64, parse_constant=_reject_constant)
+
+if orjson is not None:
+    def _loads(s):
+        if isinstance(s, str):
+            s = s.encode('utf-8')
+        # orjson silently turns integers past 64 bits into floats
+        if _RE_LONG_DIGITS.search(s):
+            return _loads_checked(s)
+        return orjson.loads(s)
+
+    def _dump_line(doc):
+        return orjson.dumps(doc) + b"\n"
 
-def _load_json(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    def _dump_pretty(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE, default=str)
+else:
+    _loads = _loads_checked
 
-def _dump_json(path, doc):
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(doc, f)
+    def _dump_line(doc):
+        line = json.dumps(doc, allow_nan=False).encode('utf-8')
+        if _RE_LONG_DIGITS.search(line):
+            _loads_checked(line)
+        return line + b"\n"
+
+    def _dump_pretty(obj):
+        return json.dumps(obj, indent=2, default=str).encode('utf-8') + b"\n"
+
+# Append handle and write buffer of one collection log. Kept apart from
+# Collection so the flush timer and finalizer don't keep the collection alive.
+class _LogWriter:
+    def __init__(self, path):
+        self.path = path
+        self.fp = None
+        self.pending = []
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def open(self):
+        with self.lock:
+            if self.fp is None:
+                self.fp = open(self.path, 'ab')
+
+    def append(self, line):
+        with self.lock:
+            self.pending.append(line)
+            if len(self.pending) >= CONFIG["log_flush_every"]:
+                self._flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(CONFIG["log_flush_interval_ms"] / 1000, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending:
+            self.fp.write(b"".join(self.pending))
+            self.fp.flush()
+            os.fsync(self.fp.fileno())
+            self.pending = []
+
+    def rewrite(self, lines):
+        # lines replace the whole log, including anything still buffered
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.pending = []
+            tmp = self.path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self.fp.close()
+            os.replace(tmp, self.path)
+            self.fp = open(self.path, 'ab')
+
+    def close(self):
+        with self.lock:
+            if self.fp is not None:
+                self._flush()
+                self.fp.close()
+                self.fp = None
 
 # Collection with compound index support
+# Documents live in memory and are persisted to a single append-only log:
+# every insert/update appends the full document, every delete appends a
+# {"$deleted": <_id>} tombstone (the only record without an _id). Appends
+# are buffered and written with one fsync per batch, at most
+# log_flush_interval_ms after the first buffered record, on close, or when
+# the collection is garbage collected. The log is compacted once it grows
+# well past the number of live documents.
+# Only one live Collection may own a log: opening a directory that is already
+# open in this process returns the existing instance.
+_open_collections = weakref.WeakValueDictionary()
+_open_collections_lock = threading.Lock()
+
 class Collection:
-    def __init__(self, name, path):
+    def __new__(cls, name, path):
+        key = os.path.realpath(path)
+        with _open_collections_lock:
+            coll = _open_collections.get(key)
+            if coll is None:
+                coll = super().__new__(cls)
+                coll._setup(name, path)
+                _open_collections[key] = coll
+        return coll
+
+    def _setup(self, name, path):
         self.name = name
         self.path = path
+        self.log_path = os.path.join(path, LOG_FILE)
         self.indexes = {}
+        self._docs = None
+        self._log = _LogWriter(self.log_path)
+        self._log_lines = 0
+        self._count = 0
+        weakref.finalize(self, self._log.close)
         os.makedirs(self.path, exist_ok=True)
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _load(self):
+        if self._docs is None:
+            docs = {}
+            lines = 0
+            if os.path.exists(self.log_path):
+                with open(self.log_path, 'rb') as f:
+                    data = f.read()
+                body, _, tail = data.rpartition(b"\n")
+                recs = [_loads(line) for line in body.splitlines() if line.strip()]
+                if tail.strip():
+                    # a crash mid-flush leaves an unterminated last line: keep it if it
+                    # parses, otherwise cut it off so later appends start on a fresh line
+                    try:
+                        recs.append(_loads(tail))
+                    except ValueError:
+                        with open(self.log_path, 'r+b') as f:
+                            f.truncate(len(data) - len(tail))
+                    else:
+                        with open(self.log_path, 'ab') as f:
+                            f.write(b"\n")
+                for rec in recs:
+                    if '_id' not in rec:
+                        docs.pop(rec['$deleted'], None)
+                    else:
+                        docs[rec['_id']] = rec
+                lines = len(recs)
+            self._docs = docs
+            self._log_lines = lines
+            self._count = len(docs)
+            self._log.open()
+        return self._docs
+
+    def _append(self, rec):
+        self._log.append(_dump_line(rec))
+        self._log_lines += 1
+
+    def flush(self):
+        self._log.flush()
+
+    def _maybe_compact(self):
+        if self._log_lines > CONFIG["log_compact_threshold"] and self._log_lines > 2 * len(self._docs):
+            self.compact()
+
+    def compact(self):
+        docs = self._load()
+        self._log.rewrite([_dump_line(doc) for doc in docs.values()])
+        self._log_lines = len(docs)
+
+    def close(self):
+        self._log.close()
+        self._docs = None
+
     def create_index(self, fields):
         key = tuple(fields) if isinstance(fields, list) else (fields,)
         if key in self.indexes:
             return
         idx = BTreeIndex(key, CONFIG["btree_degree"])
-        for fname in os.listdir(self.path):
-            if fname.endswith('.json'):
-                doc = _load_json(os.path.join(self.path, fname))
-                idx.insert(doc, doc['_id'])
+        idx.bulk_load([(idx._extract_key(doc), doc_id) for doc_id, doc in self._load().items()])
         self.indexes[key] = idx
 
-    def _update_indexes(self, doc):
+    def _update_indexes(self, doc, old=None):
         for idx in self.indexes.values():
-            idx.insert(doc, doc['_id'])
+            if old is None:
+                idx.insert(doc, doc['_id'])
+            elif idx._extract_key(old) != idx._extract_key(doc):
+                idx.remove(old, old['_id'])
+                idx.insert(doc, doc['_id'])
+
+    def _remove_from_indexes(self, doc):
+        for idx in self.indexes.values():
+            idx.remove(doc, doc['_id'])
+
+    def _next_id(self, docs):
+        prefix = threading.get_ident()
+        while True:
+            doc_id = f"{prefix}_{self._count}"
+            self._count += 1
+            if doc_id not in docs:
+                return doc_id
 
     def insert(self, doc):
-        doc_id = doc.get('_id') or f"{threading.get_ident()}_{len(os.listdir(self.path))}"
+        docs = self._load()
+        doc_id = doc.get('_id') or self._next_id(docs)
+        if type(doc_id) not in (str, int):
+            raise ValueError(f"_id must be a string or an integer, got {type(doc_id).__name__}")
         doc['_id'] = doc_id
-        path = os.path.join(self.path, f"{doc_id}.json")
-        _dump_json(path, doc)
-        self._update_indexes(doc)
+        doc = dict(doc)
+        self._append(doc)
+        old = docs.get(doc_id)
+        docs[doc_id] = doc
+        self._update_indexes(doc, old)
+        self._maybe_compact()
         return doc_id
 
     def find_ids_by_index(self, field_values):
         for key in self.indexes:
             if all(f in field_values for f in key):
+                idx = self.indexes[key]
                 values = tuple(field_values[f] for f in key)
-                return self.indexes[key].find(values)
+                if not idx.matches_exactly(values):
+                    return None
+                return idx.find(values)
         return None
 
     def load_docs(self, ids=None):
-        files = os.listdir(self.path)
-        if ids:
-            files = [f"{_id}.json" for _id in ids if f"{_id}.json" in files]
-        return [_load_json(os.path.join(self.path, f)) for f in files if f.endswith('.json')]
+        docs = self._load()
+        if ids is not None:
+            return [docs[_id] for _id in dict.fromkeys(ids) if _id in docs]
+        return list(docs.values())
 
     def update(self, updates, cond, ids=None):
+        docs = self._load()
         count = 0
         for doc in self.load_docs(ids):
             if cond(doc):
-                doc.update(updates)
-                _dump_json(os.path.join(self.path, f"{doc['_id']}.json"), doc)
+                new = dict(doc)
+                new.update(updates)
+                self._append(new)
+                docs[new['_id']] = new
+                self._update_indexes(new, doc)
                 count += 1
+        self._maybe_compact()
         return count
 
     def delete(self, cond, ids=None):
+        docs = self._load()
         count = 0
         for doc in self.load_docs(ids):
             if cond(doc):
-                os.remove(os.path.join(self.path, f"{doc['_id']}.json"))
+                del docs[doc['_id']]
+                self._append({'$deleted': doc['_id']})
+                self._remove_from_indexes(doc)
                 count += 1
+        self._maybe_compact()
         return count
 
 # Parser and Executor
+# Each command pattern matches the query after its leading keyword
+_RE_WS = re.compile(r"\s+")
+_RE_INSERT = re.compile(r"INTO (\w+)\s+(.+)", re.IGNORECASE)
+_RE_CREATE_IDX = re.compile(r"INDEX ON (\w+)\(([^)]+)\)", re.IGNORECASE)
+_RE_DELETE = re.compile(r"FROM (\w+)(?: WHERE (.+))?", re.IGNORECASE)
+_RE_UPDATE = re.compile(r"(\w+) SET (.+?)(?: WHERE (.+))?$", re.IGNORECASE)
+_RE_SELECT = re.compile(r"(.+) FROM (\w+)(?: WHERE (.+))?", re.IGNORECASE)
+_RE_AND = re.compile(r"\s+AND\s+", re.IGNORECASE)
+_RE_NUMBER = re.compile(r"-?[0-9]+(\.[0-9]+)?")
+
+def _parse_insert(rest):
+    m = _RE_INSERT.match(rest)
+    return {'cmd': 'insert', 'collection': m.group(1), 'doc': _loads(m.group(2))}
+
+def _parse_create_index(rest):
+    m = _RE_CREATE_IDX.match(rest)
+    fields = [f.strip() for f in m.group(2).split(',')]
+    return {'cmd': 'index', 'collection': m.group(1), 'fields': fields}
+
+def _parse_delete(rest):
+    m = _RE_DELETE.match(rest)
+    return {'cmd': 'delete', 'collection': m.group(1), 'where': m.group(2)}
+
+def _parse_update(rest):
+    m = _RE_UPDATE.match(rest)
+    sets = {}
+    for part in m.group(2).split(','):
+        k, v = map(str.strip, part.split('=', 1))
+        sets[k] = _loads(v) if v.startswith(('"', "'")) else int(v)
+    return {'cmd': 'update', 'collection': m.group(1), 'sets': sets, 'where': m.group(3)}
+
+def _parse_select(rest):
+    m = _RE_SELECT.match(rest)
+    fields = [f.strip() for f in m.group(1).split(',')]
+    return {'cmd': 'select', 'fields': fields, 'collection': m.group(2), 'where': m.group(3)}
+
+def _parse_number(s):
+    m = _RE_NUMBER.fullmatch(s)
+    if m is None:
+        return None
+    return float(s) if m.group(1) else int(s)
+
+_PARSERS = {
+    'INSERT': _parse_insert,
+    'CREATE': _parse_create_index,
+    'DELETE': _parse_delete,
+    'UPDATE': _parse_update,
+    'SELECT': _parse_select,
+}
+
 class QueryParser:
     @staticmethod
     def parse(query):
-        q = re.sub(r"\s+", " ", query.strip()).rstrip(';')
-        u = q.upper()
-        if u.startswith('INSERT INTO'):
-            m = re.match(r"INSERT INTO (\w+)\s+(.+)", q, re.IGNORECASE)
-            return {'cmd': 'insert', 'collection': m.group(1), 'doc': json.loads(m.group(2))}
-        if u.startswith('CREATE INDEX'):
-            m = re.match(r"CREATE INDEX ON (\w+)\(([^)]+)\)", q, re.IGNORECASE)
-            fields = [f.strip() for f in m.group(2).split(',')]
-            return {'cmd': 'index', 'collection': m.group(1), 'fields': fields}
-        if u.startswith('DELETE FROM'):
-            m = re.match(r"DELETE FROM (\w+)(?: WHERE (.+))?", q, re.IGNORECASE)
-            return {'cmd': 'delete', 'collection': m.group(1), 'where': m.group(2)}
-        if u.startswith('UPDATE'):
-            m = re.match(r"UPDATE (\w+) SET (.+?)(?: WHERE (.+))?$", q, re.IGNORECASE)
-            sets = {}
-            for part in m.group(2).split(','):
-                k, v = map(str.strip, part.split('=', 1))
-                sets[k] = json.loads(v) if v.startswith(('"', "'")) else int(v)
-            return {'cmd': 'update', 'collection': m.group(1), 'sets': sets, 'where': m.group(3)}
-        m = re.match(r"SELECT (.+) FROM (\w+)(?: WHERE (.+))?", q, re.IGNORECASE)
-        fields = [f.strip() for f in m.group(1).split(',')]
-        return {'cmd': 'select', 'fields': fields, 'collection': m.group(2), 'where': m.group(3)}
+        q = _RE_WS.sub(" ", query.strip()).rstrip(';')
+        head, _, rest = q.partition(" ")
+        parser = _PARSERS.get(head.upper())
+        if parser is None:
+            raise ValueError(f"Unknown command: {head}")
+        return parser(rest)
 
 class QueryEngine:
     def __init__(self, base):
         self.base = base
+        self._colls = {}
+        weakref.finalize(self, QueryEngine._flush_all, self._colls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _flush_all(colls):
+        for coll in colls.values():
+            coll.flush()
+
+    def _collection(self, name):
+        coll = self._colls.get(name)
+        if coll is None:
+            coll = self._colls[name] = Collection(name, os.path.join(self.base, name))
+        return coll
+
+    def flush(self):
+        QueryEngine._flush_all(self._colls)
+
+    def close(self):
+        for coll in self._colls.values():
+            coll.close()
+        self._colls.clear()
 
     def execute(self, q):
-        coll = Collection(q['collection'], os.path.join(self.base, q['collection']))
+        coll = self._collection(q['collection'])
         if q['cmd'] == 'insert':
             return {'_id': coll.insert(q['doc'])}
         if q['cmd'] == 'index':
@@ -202,7 +632,7 @@ class QueryEngine:
             docs = coll.load_docs(ids)
             filtered = [d for d in docs if cond(d)]
             if q['fields'] == ['*']:
-                return filtered
+                return [dict(d) for d in filtered]
             result = []
             for d in filtered:
                 result.append({f: d.get(f) for f in q['fields']})
@@ -210,16 +640,26 @@ class QueryEngine:
         return {}
 
     def _make_eval(self, expr):
-        expr = expr.strip()
+        comparisons = []
         fields = {}
+        for part in _RE_AND.split(expr.strip()):
+            if '=' in part:
+                k, v = map(str.strip, part.split('=', 1))
+                vs = v.strip("'\"")
+                vn = None if v[:1] in ("'", '"') else _parse_number(vs)
+                comparisons.append((k, vs, vn))
+                fields[k] = vs if vn is None else vn
         def eval_fn(doc):
-            parts = re.split(r"\s+AND\s+", expr, flags=re.IGNORECASE)
-            for part in parts:
-                if '=' in part:
-                    k, v = map(str.strip, part.split('=', 1))
-                    fields[k] = v.strip("'")
-                    if str(doc.get(k)) != v.strip("'"):
-                        return False
+            for k, vs, vn in comparisons:
+                dv = doc.get(k)
+                if type(dv) is str:
+                    ok = dv == vs
+                elif vn is not None and type(dv) in (int, float):
+                    ok = dv == vn
+                else:
+                    ok = dv is not None and str(dv) == vs
+                if not ok:
+                    return False
             return True
         return eval_fn, fields
 
@@ -234,18 +674,19 @@ if __name__ == '__main__':
         "UPDATE <collection> SET field=value WHERE ...",
         "help", "exit"
     ]
-    while True:
-        q = input('db> ').strip()
-        if not q:
-            continue
-        if q.lower() == 'exit':
-            break
-        if q.lower() == 'help':
-            print(*cmds, sep='\n')
-            continue
-        try:
-            parsed = QueryParser.parse(q)
-            result = QueryEngine(CONFIG['data_dir']).execute(parsed)
-            print(json.dumps(result, indent=2, default=str))
-        except Exception as e:
-            print(f"Error: {e}")
+    with QueryEngine(CONFIG['data_dir']) as engine:
+        while True:
+            q = input('db> ').strip()
+            if not q:
+                continue
+            if q.lower() == 'exit':
+                break
+            if q.lower() == 'help':
+                print(*cmds, sep='\n')
+                continue
+            try:
+                parsed = QueryParser.parse(q)
+                result = engine.execute(parsed)
+                sys.stdout.buffer.write(_dump_pretty(result))
+            except Exception as e:
+                print(f"Error: {e}")
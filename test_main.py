@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import main
+from main import Collection, QueryEngine, QueryParser
+
+
+class LogReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.path, main.LOG_FILE)
+        self.coll = Collection('u', self.path)
+
+    def tearDown(self):
+        self.coll.close()
+        shutil.rmtree(self.path)
+
+    def reload(self):
+        self.coll.close()
+        return sorted(self.coll.load_docs(), key=lambda d: str(d['_id']))
+
+    def write_log(self, data):
+        with open(self.log_path, 'wb') as f:
+            f.write(data)
+
+    def test_unterminated_valid_last_line_is_kept(self):
+        self.write_log(b'{"_id": "a"}\n{"_id": "b"}')
+        self.assertEqual(self.reload(), [{'_id': 'a'}, {'_id': 'b'}])
+        self.coll.insert({'_id': 'c'})
+        self.assertEqual(self.reload(), [{'_id': 'a'}, {'_id': 'b'}, {'_id': 'c'}])
+
+    def test_unterminated_garbage_last_line_is_truncated(self):
+        self.write_log(b'{"_id": "a"}\n{"_id": "b", "v"')
+        self.assertEqual(self.reload(), [{'_id': 'a'}])
+        self.coll.insert({'_id': 'c'})
+        self.assertEqual(self.reload(), [{'_id': 'a'}, {'_id': 'c'}])
+
+    def test_user_deleted_field_is_not_a_tombstone(self):
+        self.coll.insert({'_id': 'k', 'v': 1})
+        self.coll.insert({'_id': 'n', '$deleted': 'k'})
+        self.coll.delete(lambda d: d['_id'] == 'n')
+        self.assertEqual(self.reload(), [{'_id': 'k', 'v': 1}])
+
+    def test_compaction_then_reload(self):
+        threshold = main.CONFIG['log_compact_threshold']
+        main.CONFIG['log_compact_threshold'] = 10
+        self.addCleanup(main.CONFIG.__setitem__, 'log_compact_threshold', threshold)
+        for i in range(20):
+            self.coll.insert({'_id': i, 'v': i})
+        self.coll.delete(lambda d: d['v'] < 15)
+        self.coll.update({'v': 0}, lambda d: d['_id'] == 19)
+        self.coll.flush()
+        with open(self.log_path, 'rb') as f:
+            self.assertLess(f.read().count(b'\n'), 20)
+        self.assertEqual(self.reload(), [{'_id': 15, 'v': 15}, {'_id': 16, 'v': 16},
+                                         {'_id': 17, 'v': 17}, {'_id': 18, 'v': 18},
+                                         {'_id': 19, 'v': 0}])
+
+
+class LogFlushTest(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def test_dropped_engine_flushes_its_writes(self):
+        QueryEngine(self.base).execute(QueryParser.parse('INSERT INTO u {"_id": "a"}'))
+        result = QueryEngine(self.base).execute(QueryParser.parse('SELECT * FROM u'))
+        self.assertEqual(result, [{'_id': 'a'}])
+
+    def test_buffer_is_flushed_after_interval(self):
+        coll = Collection('u', os.path.join(self.base, 'u'))
+        self.addCleanup(coll.close)
+        coll.insert({'_id': 'a'})
+        time.sleep(2 * main.CONFIG['log_flush_interval_ms'] / 1000)
+        with open(coll.log_path, 'rb') as f:
+            self.assertEqual(main._loads(f.read()), {'_id': 'a'})
+
+
+class IndexMaintenanceTest(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.engine = QueryEngine(self.base)
+
+    def tearDown(self):
+        self.engine.close()
+        shutil.rmtree(self.base)
+
+    def run_query(self, query):
+        return self.engine.execute(QueryParser.parse(query))
+
+    def test_update_cycle_keeps_index_consistent(self):
+        self.run_query('INSERT INTO u {"_id": "a", "x": 1}')
+        self.run_query('CREATE INDEX ON u(x)')
+        self.run_query('UPDATE u SET x=2 WHERE x=1')
+        self.run_query('UPDATE u SET x=1 WHERE x=2')
+        self.assertEqual(self.run_query('SELECT * FROM u WHERE x=1'), [{'_id': 'a', 'x': 1}])
+        self.assertEqual(self.run_query('SELECT * FROM u WHERE x=2'), [])
+        self.assertEqual(self.run_query('DELETE FROM u WHERE x=1'), {'removed': 1})
+        self.assertEqual(self.run_query('SELECT * FROM u'), [])
+
+    def test_reinsert_existing_id_replaces_index_entry(self):
+        self.run_query('INSERT INTO u {"_id": "a", "x": 1}')
+        self.run_query('CREATE INDEX ON u(x)')
+        self.run_query('INSERT INTO u {"_id": "a", "x": 1}')
+        self.assertEqual(self.run_query('SELECT * FROM u WHERE x=1'), [{'_id': 'a', 'x': 1}])
+        self.assertEqual(self.run_query('UPDATE u SET x=3 WHERE x=1'), {'updated': 1})
+
+    def test_index_miss_returns_no_rows_without_scanning(self):
+        self.run_query('INSERT INTO u {"_id": "a", "x": 1}')
+        self.run_query('CREATE INDEX ON u(x)')
+        coll = self.engine._collection('u')
+        self.assertEqual(coll.find_ids_by_index({'x': 5}), [])
+        self.assertEqual(self.run_query('SELECT * FROM u WHERE x=5'), [])
+        self.assertEqual(self.run_query('DELETE FROM u WHERE x=5'), {'removed': 0})
+
+    def test_literal_of_another_type_falls_back_to_scan(self):
+        self.run_query('INSERT INTO u {"_id": "a", "x": 30}')
+        self.run_query('CREATE INDEX ON u(x)')
+        self.assertIsNone(self.engine._collection('u').find_ids_by_index({'x': '30'}))
+        self.assertEqual(self.run_query("SELECT * FROM u WHERE x='30'"), [{'_id': 'a', 'x': 30}])
+
+
+if __name__ == '__main__':
+    unittest.main()